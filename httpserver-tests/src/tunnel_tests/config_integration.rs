@@ -25,6 +25,31 @@ async fn find_available_ports(count: usize) -> Vec<u16> {
     ports
 }
 
+/// Wait for the tunnel server health endpoint to respond, polling with exponential backoff
+#[must_use]
+async fn wait_for_server(client: &reqwest::Client, tunnel_port: u16, timeout: Duration) -> bool {
+    let health_url = format!("http://127.0.0.1:{}/health", tunnel_port);
+    let deadline = tokio::time::Instant::now() + timeout;
+    let mut delay = Duration::from_millis(5);
+
+    loop {
+        // HEAD skips the body; any non-5xx answer means the listener is up
+        let probe = client.head(&health_url).timeout(Duration::from_millis(500)).send().await;
+        if let Ok(response) = probe {
+            if !response.status().is_server_error() {
+                return true;
+            }
+        }
+
+        if tokio::time::Instant::now() + delay > deadline {
+            return false;
+        }
+
+        sleep(delay).await;
+        delay = std::cmp::min(delay * 3 / 2, Duration::from_millis(250));
+    }
+}
+
 /// Create test configuration with specified ports
 fn create_test_config(tunnel_port: u16, public_port: u16, public_https_port: u16) -> TunnelServerConfig {
     TunnelServerConfig {
@@ -79,8 +104,9 @@ async fn test_server_startup_with_valid_bind_addresses() {
         server.start().await
     });
     
-    // Give server time to start
-    sleep(Duration::from_millis(100)).await;
+    // Wait for server to start
+    let client = reqwest::Client::new();
+    assert!(wait_for_server(&client, ports[0], Duration::from_secs(5)).await, "tunnel server did not become ready");
     
     // Check if ports are being used (server is listening)
     let tunnel_check = TcpListener::bind(format!("127.0.0.1:{}", ports[0])).await;
@@ -187,11 +213,11 @@ async fn test_health_endpoint_availability() {
         server.start().await
     });
     
-    // Give server time to start
-    sleep(Duration::from_millis(200)).await;
+    // Wait for server to start
+    let client = reqwest::Client::new();
+    assert!(wait_for_server(&client, config.tunnel_port, Duration::from_secs(5)).await, "tunnel server did not become ready");
     
     // Test health endpoint is available on tunnel port
-    let client = reqwest::Client::new();
     let health_url = format!("http://127.0.0.1:{}/health", config.tunnel_port);
     
     match client.get(&health_url).send().await {
@@ -260,7 +286,8 @@ async fn test_complete_port_configuration_flow() {
     });
     
     // Verify server is running by checking port usage
-    sleep(Duration::from_millis(100)).await;
+    let client = reqwest::Client::new();
+    assert!(wait_for_server(&client, ports[0], Duration::from_secs(5)).await, "tunnel server did not become ready");
     
     let tunnel_listener = TcpListener::bind(format!("127.0.0.1:{}", ports[0])).await;
     let public_listener = TcpListener::bind(format!("127.0.0.1:{}", ports[1])).await;
@@ -6,6 +6,8 @@ use httpserver_tunnel::config::{TunnelServerConfig, TunnelServerAuthConfig, Tunn
 use httpserver_tunnel::server::TunnelServer;
 use httpserver_tunnel::protocol::{TunnelMessage, TunnelProtocol};
 use tokio::time::{timeout, Duration};
+use tokio_tungstenite::{connect_async, tungstenite::Message};
+use futures_util::{SinkExt, StreamExt};
 use std::collections::HashMap;
 
 /// Create test tunnel server configuration
@@ -182,7 +184,7 @@ async fn test_tunnel_protocol_messages() {
         TunnelMessage::Auth { token, subdomain, protocol_version } => {
             assert_eq!(token, "test-token");
             assert_eq!(subdomain, Some("myapp".to_string()));
-            assert_eq!(protocol_version, "1.0");
+            assert_eq!(protocol_version, "1.1");
         }
         _ => panic!("Expected Auth message"),
     }
@@ -265,13 +267,13 @@ async fn test_message_serialization() {
 async fn test_protocol_version_compatibility() {
     let protocol = TunnelProtocol::new();
     
-    // Test compatible version
+    // Test compatible versions (1.0 peers get number-array payloads)
+    assert!(protocol.is_compatible_version("1.1"));
     assert!(protocol.is_compatible_version("1.0"));
     
     // Test incompatible versions
     assert!(!protocol.is_compatible_version("2.0"));
     assert!(!protocol.is_compatible_version("0.9"));
-    assert!(!protocol.is_compatible_version("1.1"));
     assert!(!protocol.is_compatible_version("invalid"));
 }
 
@@ -319,3 +321,160 @@ async fn test_port_configuration_edge_cases() {
     config.public_https_port = 8080;
     assert!(TunnelServer::new(config).is_ok());
 }
+
+/// Reserve a free local port by binding to port 0 and releasing it
+fn free_port() -> u16 {
+    std::net::TcpListener::bind("127.0.0.1:0")
+        .expect("Failed to bind ephemeral port")
+        .local_addr()
+        .unwrap()
+        .port()
+}
+
+/// Send an Auth message over a tunnel WebSocket and wait for the server's reply
+async fn send_auth(
+    ws: &mut tokio_tungstenite::WebSocketStream<tokio_tungstenite::MaybeTlsStream<tokio::net::TcpStream>>,
+    subdomain: Option<&str>
+) -> TunnelMessage {
+    let auth = TunnelProtocol::create_auth_message("test-token", subdomain);
+    let data = TunnelProtocol::serialize_message(&auth).unwrap();
+    ws.send(Message::Binary(data)).await.expect("Failed to send auth message");
+
+    loop {
+        let msg = timeout(Duration::from_secs(5), ws.next()).await
+            .expect("Timed out waiting for auth response")
+            .expect("Tunnel WebSocket closed")
+            .expect("Tunnel WebSocket error");
+        let data = match msg {
+            Message::Text(text) => text.into_bytes(),
+            Message::Binary(data) => data,
+            _ => continue,
+        };
+        return TunnelProtocol::deserialize_message(&data).expect("Invalid tunnel message");
+    }
+}
+
+#[tokio::test]
+async fn test_reauthentication_releases_previous_subdomain() {
+    let mut config = create_test_server_config();
+    config.tunnel_port = free_port();
+    config.public_port = free_port();
+    config.auth.required = false;
+    config.rate_limiting.enabled = false;
+    let tunnel_port = config.tunnel_port;
+
+    let server = TunnelServer::new(config).expect("Failed to create tunnel server");
+    let server_handle = tokio::spawn(async move { server.start().await });
+
+    // Unique subdomains so runs sharing the persisted subdomain store do not collide
+    let suffix = std::time::SystemTime::now()
+        .duration_since(std::time::UNIX_EPOCH)
+        .unwrap()
+        .as_nanos() % 1_000_000_000;
+    let first = format!("reauth-a{}", suffix);
+    let second = format!("reauth-b{}", suffix);
+
+    let url = format!("ws://127.0.0.1:{}/connect", tunnel_port);
+    let mut first_ws = None;
+    for _ in 0..50 {
+        if let Ok((ws, _)) = connect_async(&url).await {
+            first_ws = Some(ws);
+            break;
+        }
+        tokio::time::sleep(Duration::from_millis(50)).await;
+    }
+    let mut first_ws = first_ws.expect("tunnel server did not become ready");
+
+    match send_auth(&mut first_ws, Some(first.as_str())).await {
+        TunnelMessage::AuthResponse { success, assigned_subdomain, .. } => {
+            assert!(success);
+            assert_eq!(assigned_subdomain, Some(first.clone()));
+        }
+        other => panic!("Expected AuthResponse, got {:?}", other),
+    }
+
+    // Re-authenticating on the same WebSocket moves the session to the new subdomain
+    match send_auth(&mut first_ws, Some(second.as_str())).await {
+        TunnelMessage::AuthResponse { success, assigned_subdomain, .. } => {
+            assert!(success);
+            assert_eq!(assigned_subdomain, Some(second.clone()));
+        }
+        other => panic!("Expected AuthResponse, got {:?}", other),
+    }
+
+    // The first subdomain was released and can be claimed by another tunnel
+    let (mut other_ws, _) = connect_async(&url).await.expect("Failed to connect second tunnel");
+    match send_auth(&mut other_ws, Some(first.as_str())).await {
+        TunnelMessage::AuthResponse { success, assigned_subdomain, .. } => {
+            assert!(success, "Released subdomain should be reusable");
+            assert_eq!(assigned_subdomain, Some(first.clone()));
+        }
+        other => panic!("Expected AuthResponse, got {:?}", other),
+    }
+
+    // A failed re-authentication leaves the existing session in place
+    match send_auth(&mut first_ws, Some(first.as_str())).await {
+        TunnelMessage::AuthResponse { success, .. } => assert!(!success),
+        other => panic!("Expected AuthResponse, got {:?}", other),
+    }
+    let health = reqwest::get(format!("http://127.0.0.1:{}/health", tunnel_port)).await
+        .expect("Health check failed")
+        .text().await
+        .expect("Invalid health response");
+    let health: serde_json::Value = serde_json::from_str(&health).unwrap();
+    assert_eq!(health["active_tunnels"], 2);
+
+    let _ = first_ws.close(None).await;
+    let _ = other_ws.close(None).await;
+    server_handle.abort();
+}
+
+#[tokio::test]
+async fn test_reauthentication_without_subdomain_keeps_previous_subdomain() {
+    let mut config = create_test_server_config();
+    config.tunnel_port = free_port();
+    config.public_port = free_port();
+    config.auth.required = false;
+    config.rate_limiting.enabled = false;
+    let tunnel_port = config.tunnel_port;
+
+    let server = TunnelServer::new(config).expect("Failed to create tunnel server");
+    let server_handle = tokio::spawn(async move { server.start().await });
+
+    let suffix = std::time::SystemTime::now()
+        .duration_since(std::time::UNIX_EPOCH)
+        .unwrap()
+        .as_nanos() % 1_000_000_000;
+    let subdomain = format!("refresh-{}", suffix);
+
+    let url = format!("ws://127.0.0.1:{}/connect", tunnel_port);
+    let mut ws = None;
+    for _ in 0..50 {
+        if let Ok((stream, _)) = connect_async(&url).await {
+            ws = Some(stream);
+            break;
+        }
+        tokio::time::sleep(Duration::from_millis(50)).await;
+    }
+    let mut ws = ws.expect("tunnel server did not become ready");
+
+    match send_auth(&mut ws, Some(subdomain.as_str())).await {
+        TunnelMessage::AuthResponse { success, assigned_subdomain, .. } => {
+            assert!(success);
+            assert_eq!(assigned_subdomain, Some(subdomain.clone()));
+        }
+        other => panic!("Expected AuthResponse, got {:?}", other),
+    }
+
+    // A token refresh that does not name a subdomain keeps the public URL
+    match send_auth(&mut ws, None).await {
+        TunnelMessage::AuthResponse { success, assigned_subdomain, .. } => {
+            assert!(success);
+            assert_eq!(assigned_subdomain, Some(subdomain.clone()));
+        }
+        other => panic!("Expected AuthResponse, got {:?}", other),
+    }
+
+    let _ = ws.close(None).await;
+    server_handle.abort();
+}
@@ -160,6 +160,9 @@ async fn start_test_tunnel_client(local_port: u16) -> tokio::task::JoinHandle<()
             }
         }
         
+        // Reuse one HTTP client so forwarded requests share pooled connections to the local server
+        let http_client = reqwest::Client::new();
+
         // Handle incoming requests
         while let Some(msg) = ws_receiver.next().await {
             let msg = msg.expect("WebSocket error");
@@ -170,7 +173,7 @@ async fn start_test_tunnel_client(local_port: u16) -> tokio::task::JoinHandle<()
                             debug!("Tunnel client received HTTP request: {} {}", method, path);
                             
                             // Forward to local server
-                            let response = forward_to_local_server(&method, &path, &headers, body, local_port).await;
+                            let response = forward_to_local_server(&http_client, &method, &path, &headers, body, local_port).await;
                             
                             // Send response back
                             let response_msg = TunnelMessage::HttpResponse {
@@ -206,6 +209,7 @@ struct TestHttpResponse {
 }
 
 async fn forward_to_local_server(
+    client: &reqwest::Client,
     _method: &str,
     path: &str,
     _headers: &HashMap<String, String>,
@@ -215,7 +219,7 @@ async fn forward_to_local_server(
     // Simple HTTP client for testing
     let url = format!("http://127.0.0.1:{}{}", port, path);
     
-    match reqwest::get(&url).await {
+    match client.get(&url).send().await {
         Ok(response) => {
             let status = response.status().as_u16();
             let headers = response.headers()
@@ -7,12 +7,15 @@ use crate::config::TunnelConfig;
 use crate::connection::{TunnelConnection, ConnectionState};
 use crate::status::{TunnelStatus, TunnelStatusMonitor, TunnelEvent, TunnelEventType, ConfigSummary};
 
+use futures_util::future::join_all;
 use std::collections::HashMap;
 use std::sync::Arc;
 use tokio::sync::{RwLock, watch};
 use tokio::task::JoinHandle;
-use tokio::time::{interval, Duration};
-use tracing;
+use tokio::time::{interval, timeout_at, Duration, Instant};
+
+/// Time allowed for all connection tasks to finish after a shutdown signal
+const CONNECTION_SHUTDOWN_TIMEOUT: Duration = Duration::from_secs(5);
 
 /// Main tunnel client that manages multiple tunnel connections
 pub struct TunnelClient {
@@ -26,6 +29,7 @@ pub struct TunnelClient {
     status_receiver: watch::Receiver<Vec<TunnelStatus>>,
     
     // Background tasks
+    connection_tasks: Vec<JoinHandle<()>>,
     monitoring_task: Option<JoinHandle<()>>,
     health_check_task: Option<JoinHandle<()>>,
     
@@ -57,6 +61,7 @@ impl TunnelClient {
             shutdown_sender: None,
             status_sender,
             status_receiver,
+            connection_tasks: Vec::new(),
             monitoring_task: None,
             health_check_task: None,
             is_running: Arc::new(RwLock::new(false)),
@@ -86,9 +91,14 @@ impl TunnelClient {
         );
         self.status_monitor.write().await.record_event(event);
 
-        // Validate authentication before starting connections
-        for endpoint in &self.config.endpoints {
-            match self.authenticator.validate_credentials(&endpoint.server_url).await {
+        // Validate authentication for all endpoints concurrently before starting connections
+        let authenticator = &self.authenticator;
+        let validations = self.config.endpoints.iter().map(|endpoint| async move {
+            (endpoint, authenticator.validate_credentials(&endpoint.server_url).await)
+        });
+
+        for (endpoint, validation) in join_all(validations).await {
+            match validation {
                 Ok(true) => {
                     tracing::info!(url = %endpoint.server_url, "Authentication validated");
                 }
@@ -108,8 +118,6 @@ impl TunnelClient {
         self.shutdown_sender = Some(shutdown_tx.clone());
 
         // Start connections for each endpoint
-        let mut connection_tasks = Vec::new();
-        
         for (index, endpoint) in self.config.endpoints.iter().enumerate() {
             let connection_id = format!("tunnel-{}", index);
               let connection = TunnelConnection::new(
@@ -164,7 +172,7 @@ impl TunnelClient {
                 }
             });
             
-            connection_tasks.push(task);
+            self.connection_tasks.push(task);
         }
 
         // Start monitoring tasks
@@ -197,6 +205,15 @@ impl TunnelClient {
             task.abort();
         }
 
+        // Wait for all connection tasks against one shared deadline, then abort any stragglers
+        let deadline = Instant::now() + CONNECTION_SHUTDOWN_TIMEOUT;
+        for mut task in self.connection_tasks.drain(..) {
+            if timeout_at(deadline, &mut task).await.is_err() {
+                tracing::warn!("Connection task did not stop before shutdown deadline, aborting");
+                task.abort();
+            }
+        }
+
         // Clear connections
         self.connections.write().await.clear();
 
@@ -399,7 +399,7 @@ fn default_local_host() -> String {
 }
 
 fn default_protocol_version() -> String {
-    "1.0".to_string()
+    crate::protocol::PROTOCOL_VERSION.to_string()
 }
 
 fn default_connection_timeout() -> u64 {
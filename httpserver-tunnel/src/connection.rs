@@ -5,20 +5,28 @@ use crate::{TunnelError, TunnelResult};
 use crate::auth::{TunnelAuthenticator, TunnelCredentials};
 use crate::config::{TunnelEndpoint, ReconnectionConfig};
 use crate::status::{ConnectionHealth, TunnelMetrics};
-use crate::protocol::TunnelMessage;
+use crate::protocol::{TunnelMessage, TunnelProtocol, PayloadEncoding};
 
 use futures_util::{SinkExt, StreamExt};
 use serde::{Deserialize, Serialize};
 use std::sync::Arc;
 use std::time::{Duration, Instant};
-use tokio::sync::{mpsc, RwLock, watch};
+use tokio::sync::{mpsc, RwLock, Semaphore, watch};
 use tokio::time::{interval, sleep};
 use tokio_tungstenite::{connect_async_tls_with_config, tungstenite::Message};
-use tracing;
 use url::Url;
-use reqwest;
 use std::collections::HashMap;
 
+/// HTTP methods the client will forward to the local server
+static SUPPORTED_METHODS: [reqwest::Method; 6] = [
+    reqwest::Method::GET,
+    reqwest::Method::POST,
+    reqwest::Method::PUT,
+    reqwest::Method::DELETE,
+    reqwest::Method::PATCH,
+    reqwest::Method::HEAD,
+];
+
 /// Connection state
 #[derive(Debug, Clone, PartialEq, Serialize, Deserialize)]
 pub enum ConnectionState {
@@ -111,6 +119,7 @@ pub struct TunnelConnection {
     // HTTP client for forwarding requests to local server
     http_client: reqwest::Client,
     local_server_url: String,
+    request_permits: Arc<Semaphore>,
 }
 
 impl TunnelConnection {    /// Create new tunnel connection
@@ -130,6 +139,7 @@ impl TunnelConnection {    /// Create new tunnel connection
             .expect("Failed to create HTTP client");
             
         let local_server_url = format!("http://{}:{}", local_host, local_port);
+        let request_permits = Arc::new(Semaphore::new(endpoint.max_connections.max(1) as usize));
         
         Self {
             endpoint,
@@ -148,6 +158,7 @@ impl TunnelConnection {    /// Create new tunnel connection
             session_id: Arc::new(RwLock::new(None)),
             http_client,
             local_server_url,
+            request_permits,
         }
     }    /// Start tunnel connection with auto-reconnection
     pub async fn start(&mut self) -> TunnelResult<()> {
@@ -224,16 +235,16 @@ impl TunnelConnection {    /// Create new tunnel connection
             Some(self.create_tls_config().await?)
         } else {
             None
-        };        // Connect to WebSocket
+        };        // Connect to WebSocket with Nagle disabled so small frames (auth, pongs, responses) go out immediately
         let (ws_stream, _) = if let Some(tls_config) = tls_config {
             // For tokio-tungstenite, we need to use their Connector type
             use tokio_tungstenite::Connector;
             let connector = Connector::Rustls(Arc::new(tls_config));
-            connect_async_tls_with_config(&ws_url, None, false, Some(connector))
+            connect_async_tls_with_config(&ws_url, None, true, Some(connector))
                 .await
                 .map_err(|e| TunnelError::ConnectionFailed(format!("WebSocket TLS connection failed: {}", e)))?
         } else {
-            tokio_tungstenite::connect_async(&ws_url)
+            tokio_tungstenite::connect_async_with_config(&ws_url, None, true)
                 .await
                 .map_err(|e| TunnelError::ConnectionFailed(format!("WebSocket connection failed: {}", e)))?
         };
@@ -264,6 +275,9 @@ impl TunnelConnection {    /// Create new tunnel connection
         let keepalive_interval_secs = self.endpoint.keepalive_interval;
         let mut keepalive_timer = interval(Duration::from_secs(keepalive_interval_secs));
         
+        // Payloads are encoded for the protocol version announced in the Auth message
+        let payload_encoding = PayloadEncoding::for_version(&self.endpoint.protocol_version);
+
         // Main message loop
         loop {
             tokio::select! {
@@ -289,7 +303,9 @@ impl TunnelConnection {    /// Create new tunnel connection
                 
                 // Handle outgoing messages
                 Some(tunnel_msg) = message_rx.recv() => {
-                    let ws_msg = Message::Text(serde_json::to_string(&tunnel_msg).unwrap());
+                    let ws_msg = Message::Text(
+                        TunnelProtocol::serialize_message_text(&tunnel_msg, payload_encoding).unwrap()
+                    );
                     if let Err(e) = ws_sender.send(ws_msg).await {
                         tracing::error!(error = %e, "Failed to send WebSocket message");
                         break;
@@ -378,16 +394,11 @@ impl TunnelConnection {    /// Create new tunnel connection
         
         ws_sender.send(ws_msg).await
             .map_err(|e| TunnelError::ConnectionFailed(format!("Failed to send auth message: {}", e)))?;        // Wait for authentication response
-        // Keep trying to read messages until we get AuthResponse or timeout
-        let start_time = Instant::now();
-        let timeout_duration = Duration::from_secs(30);
+        // Keep reading messages until we get AuthResponse or the overall deadline passes
+        let deadline = tokio::time::Instant::now() + Duration::from_secs(30);
         
         loop {
-            if start_time.elapsed() > timeout_duration {
-                return Err(TunnelError::ConnectionFailed("Authentication timeout".to_string()));
-            }
-            
-            match tokio::time::timeout(Duration::from_secs(5), ws_receiver.next()).await {
+            match tokio::time::timeout_at(deadline, ws_receiver.next()).await {
                 Ok(Some(Ok(Message::Text(text)))) => {
                     match serde_json::from_str::<TunnelMessage>(&text) {
                         Ok(TunnelMessage::AuthResponse { success, assigned_subdomain, error }) => {
@@ -432,8 +443,7 @@ impl TunnelConnection {    /// Create new tunnel connection
                     return Err(TunnelError::ConnectionFailed("Connection closed during authentication".to_string()));
                 }
                 Err(_) => {
-                    // Timeout on this iteration, continue the loop
-                    continue;
+                    return Err(TunnelError::ConnectionFailed("Authentication timeout".to_string()));
                 }
             }
         }
@@ -478,34 +488,48 @@ impl TunnelConnection {    /// Create new tunnel connection
             TunnelMessage::HttpRequest { id, method, path, headers, body, client_ip } => {
                 tracing::debug!(id = %id, method = %method, path = %path, client_ip = %client_ip, "Received HTTP request, forwarding to local server");
                 
-                // Forward the HTTP request to the local server
-                match self.forward_http_request(&id, &method, &path, headers, body).await {
-                    Ok(response) => {
-                        // Send the response back through the tunnel
-                        if let Some(sender) = &self.message_sender {
-                            if let Err(e) = sender.send(response) {
-                                tracing::error!(id = %id, error = %e, "Failed to send HTTP response through tunnel");
-                            } else {
-                                tracing::debug!(id = %id, "Successfully sent HTTP response through tunnel");
-                            }
-                        } else {
-                            tracing::error!(id = %id, "No message sender available for HTTP response");
-                        }
+                let sender = match &self.message_sender {
+                    Some(sender) => sender.clone(),
+                    None => {
+                        tracing::error!(id = %id, "No message sender available for HTTP response");
+                        return Ok(());
                     }
-                    Err(e) => {
-                        tracing::error!(id = %id, error = %e, "Failed to forward HTTP request to local server");
-                        // Send error response back through tunnel
-                        if let Some(sender) = &self.message_sender {
-                            let error_response = TunnelMessage::HttpResponse {
+                };
+
+                // Bound in-flight requests; when all permits are taken this applies backpressure to the read loop
+                let permit = self.request_permits.clone().acquire_owned().await
+                    .map_err(|_| TunnelError::ConnectionFailed("Request limiter closed".to_string()))?;
+
+                // Forward concurrently so a slow local response doesn't stall the requests behind it;
+                // responses carry the request id, so the server matches them regardless of order
+                let http_client = self.http_client.clone();
+                let local_server_url = self.local_server_url.clone();
+                tokio::spawn(async move {
+                    let _permit = permit;
+
+                    let response = match Self::forward_http_request(
+                        &http_client, &local_server_url, &id, &method, &path, headers, body
+                    ).await {
+                        Ok(response) => response,
+                        Err(e) => {
+                            tracing::error!(id = %id, error = %e, "Failed to forward HTTP request to local server");
+                            // Send error response back through tunnel
+                            TunnelMessage::HttpResponse {
                                 id: id.clone(),
                                 status: 500,
                                 headers: HashMap::new(),
                                 body: Some(b"Internal Server Error".to_vec()),
-                            };
-                            let _ = sender.send(error_response);
+                            }
                         }
+                    };
+
+                    // Send the response back through the tunnel
+                    if let Err(e) = sender.send(response) {
+                        tracing::error!(id = %id, error = %e, "Failed to send HTTP response through tunnel");
+                    } else {
+                        tracing::debug!(id = %id, "Successfully sent HTTP response through tunnel");
                     }
-                }
+                });
                 Ok(())
             }
             TunnelMessage::Pong { timestamp } => {
@@ -535,14 +559,15 @@ impl TunnelConnection {    /// Create new tunnel connection
 
     /// Forward HTTP request to local server and return response
     async fn forward_http_request(
-        &self,
+        http_client: &reqwest::Client,
+        local_server_url: &str,
         request_id: &str,
         method: &str,
         path: &str,
         headers: HashMap<String, String>,
         body: Option<Vec<u8>>,
     ) -> TunnelResult<TunnelMessage> {
-        let url = format!("{}{}", self.local_server_url, path);
+        let url = format!("{}{}", local_server_url, path);
         
         tracing::debug!(
             request_id = %request_id,
@@ -554,14 +579,12 @@ impl TunnelConnection {    /// Create new tunnel connection
         );
 
         // Build the request
-        let mut request_builder = match method.to_uppercase().as_str() {
-            "GET" => self.http_client.get(&url),
-            "POST" => self.http_client.post(&url),
-            "PUT" => self.http_client.put(&url),
-            "DELETE" => self.http_client.delete(&url),
-            "PATCH" => self.http_client.patch(&url),
-            "HEAD" => self.http_client.head(&url),
-            _ => {
+        let supported_method = SUPPORTED_METHODS
+            .iter()
+            .find(|supported| supported.as_str().eq_ignore_ascii_case(method));
+        let mut request_builder = match supported_method {
+            Some(supported) => http_client.request(supported.clone(), &url),
+            None => {
                 tracing::warn!(request_id = %request_id, method = %method, "Unsupported HTTP method");
                 return Ok(TunnelMessage::HttpResponse {
                     id: request_id.to_string(),
@@ -574,7 +597,7 @@ impl TunnelConnection {    /// Create new tunnel connection
 
         // Add headers (skip host header to avoid conflicts)
         for (key, value) in headers {
-            if key.to_lowercase() != "host" {
+            if !key.eq_ignore_ascii_case("host") {
                 request_builder = request_builder.header(&key, &value);
             }
         }
@@ -27,6 +27,7 @@ pub enum TunnelMessage {
         method: String,
         path: String,
         headers: HashMap<String, String>,
+        #[serde(default, with = "payload_encoding::option")]
         body: Option<Vec<u8>>,
         client_ip: String,
     },
@@ -35,6 +36,7 @@ pub enum TunnelMessage {
         id: String,
         status: u16,
         headers: HashMap<String, String>,
+        #[serde(default, with = "payload_encoding::option")]
         body: Option<Vec<u8>>,
     },
     /// Tunnel heartbeat/keepalive
@@ -59,11 +61,13 @@ pub enum TunnelMessage {
     /// SSL/TLS connection establishment for passthrough
     SslConnect {
         id: String,
+        #[serde(default, with = "payload_encoding::option")]
         initial_data: Option<Vec<u8>>,
     },
     /// SSL/TLS data forwarding
     SslData {
         id: String,
+        #[serde(with = "payload_encoding")]
         data: Vec<u8>,
     },
     /// SSL/TLS connection close
@@ -72,6 +76,88 @@ pub enum TunnelMessage {
     },
 }
 
+/// Current tunnel protocol version
+/// 1.1 sends binary payloads as base64 strings; 1.0 peers expect JSON number arrays, so the
+/// encoding used towards a peer follows the version it authenticated with
+pub const PROTOCOL_VERSION: &str = "1.1";
+
+/// Previous protocol version, still accepted at the handshake
+pub const LEGACY_PROTOCOL_VERSION: &str = "1.0";
+
+/// Wire encoding for binary payloads sent to a peer
+#[derive(Debug, Clone, Copy, PartialEq, Eq)]
+pub enum PayloadEncoding {
+    /// Base64 strings (protocol 1.1)
+    Base64,
+    /// JSON number arrays (protocol 1.0)
+    NumberArray,
+}
+
+impl PayloadEncoding {
+    /// Encoding a peer speaking the given protocol version can decode
+    pub fn for_version(protocol_version: &str) -> Self {
+        if protocol_version == LEGACY_PROTOCOL_VERSION {
+            PayloadEncoding::NumberArray
+        } else {
+            PayloadEncoding::Base64
+        }
+    }
+}
+
+/// Binary payload encoding for tunnel messages
+/// Payloads are sent as base64 strings rather than JSON number arrays, which are several times
+/// larger and slower to parse; the legacy array form is still accepted when decoding
+mod payload_encoding {
+    use base64::{ Engine as _, engine::general_purpose };
+    use serde::{ Deserialize, Deserializer, Serializer };
+
+    /// Payload as it may appear on the wire
+    #[derive(Deserialize)]
+    #[serde(untagged)]
+    pub(super) enum EncodedPayload {
+        Base64(String),
+        Legacy(Vec<u8>),
+    }
+
+    impl EncodedPayload {
+        pub(super) fn into_bytes<E: serde::de::Error>(self) -> Result<Vec<u8>, E> {
+            match self {
+                EncodedPayload::Base64(encoded) => general_purpose::STANDARD
+                    .decode(encoded)
+                    .map_err(E::custom),
+                EncodedPayload::Legacy(bytes) => Ok(bytes),
+            }
+        }
+    }
+
+    pub fn serialize<S: Serializer>(bytes: &[u8], serializer: S) -> Result<S::Ok, S::Error> {
+        serializer.serialize_str(&general_purpose::STANDARD.encode(bytes))
+    }
+
+    pub fn deserialize<'de, D: Deserializer<'de>>(deserializer: D) -> Result<Vec<u8>, D::Error> {
+        EncodedPayload::deserialize(deserializer)?.into_bytes()
+    }
+
+    /// Same encoding for optional payloads
+    pub mod option {
+        use super::EncodedPayload;
+        use serde::{ Deserialize, Deserializer, Serializer };
+
+        pub fn serialize<S: Serializer>(bytes: &Option<Vec<u8>>, serializer: S) -> Result<S::Ok, S::Error> {
+            match bytes {
+                Some(bytes) => super::serialize(bytes, serializer),
+                None => serializer.serialize_none(),
+            }
+        }
+
+        pub fn deserialize<'de, D: Deserializer<'de>>(deserializer: D) -> Result<Option<Vec<u8>>, D::Error> {
+            Option::<EncodedPayload>::deserialize(deserializer)?
+                .map(EncodedPayload::into_bytes)
+                .transpose()
+        }
+    }
+}
+
 /// Tunnel protocol handler
 #[derive(Debug)]
 pub struct TunnelProtocol {
@@ -82,7 +168,7 @@ impl TunnelProtocol {
     /// Create new tunnel protocol instance
     pub fn new() -> Self {
         Self {
-            protocol_version: "1.0".to_string(),
+            protocol_version: PROTOCOL_VERSION.to_string(),
         }
     }
 
@@ -91,7 +177,7 @@ impl TunnelProtocol {
         TunnelMessage::Auth {
             token: token.to_string(),
             subdomain: subdomain.map(|s| s.to_string()),
-            protocol_version: "1.0".to_string(),
+            protocol_version: PROTOCOL_VERSION.to_string(),
         }
     }
 
@@ -181,6 +267,35 @@ impl TunnelProtocol {
         serde_json::to_vec(message)
     }
 
+    /// Serialize message to JSON text using the payload encoding the peer expects
+    pub fn serialize_message_text(
+        message: &TunnelMessage,
+        encoding: PayloadEncoding,
+    ) -> Result<String, serde_json::Error> {
+        let payload = match message {
+            TunnelMessage::HttpRequest { body, .. } | TunnelMessage::HttpResponse { body, .. } => {
+                body.as_deref().map(|bytes| ("body", bytes))
+            }
+            TunnelMessage::SslConnect { initial_data, .. } => {
+                initial_data.as_deref().map(|bytes| ("initial_data", bytes))
+            }
+            TunnelMessage::SslData { data, .. } => Some(("data", data.as_slice())),
+            _ => None,
+        };
+
+        match (encoding, payload) {
+            (PayloadEncoding::NumberArray, Some((field, bytes))) => {
+                // Patch the payload field for 1.0 peers rather than keeping a second set of serde impls
+                let mut value = serde_json::to_value(message)?;
+                if let Some(fields) = value.as_object_mut() {
+                    fields.insert(field.to_string(), serde_json::Value::from(bytes));
+                }
+                serde_json::to_string(&value)
+            }
+            _ => serde_json::to_string(message),
+        }
+    }
+
     /// Deserialize message from JSON bytes
     pub fn deserialize_message(data: &[u8]) -> Result<TunnelMessage, serde_json::Error> {
         serde_json::from_slice(data)
@@ -188,9 +303,9 @@ impl TunnelProtocol {
 
     /// Validate protocol version compatibility
     pub fn is_compatible_version(&self, client_version: &str) -> bool {
-        // For now, only support exact version match
+        // The current version and 1.0, which differs only in payload encoding
         // Future: implement semantic versioning compatibility
-        client_version == self.protocol_version
+        client_version == self.protocol_version || client_version == LEGACY_PROTOCOL_VERSION
     }
 }
 
@@ -211,7 +326,7 @@ mod tests {
             TunnelMessage::Auth { token, subdomain, protocol_version } => {
                 assert_eq!(token, "test-token");
                 assert_eq!(subdomain, Some("myapp".to_string()));
-                assert_eq!(protocol_version, "1.0");
+                assert_eq!(protocol_version, PROTOCOL_VERSION);
             }
             _ => panic!("Expected Auth message"),
         }
@@ -230,4 +345,65 @@ mod tests {
             _ => panic!("Serialization/deserialization failed"),
         }
     }
+
+    #[test]
+    fn test_payload_base64_encoding() {
+        let original = TunnelProtocol::create_http_response_message(
+            "req-1",
+            200,
+            HashMap::new(),
+            Some(b"hello tunnel".to_vec()),
+        );
+        let serialized = TunnelProtocol::serialize_message(&original).unwrap();
+        let json: serde_json::Value = serde_json::from_slice(&serialized).unwrap();
+        assert_eq!(json["body"], "aGVsbG8gdHVubmVs");
+
+        match TunnelProtocol::deserialize_message(&serialized).unwrap() {
+            TunnelMessage::HttpResponse { body, .. } => {
+                assert_eq!(body, Some(b"hello tunnel".to_vec()));
+            }
+            _ => panic!("Expected HttpResponse message"),
+        }
+    }
+
+    #[test]
+    fn test_payload_legacy_array_encoding() {
+        let legacy = br#"{"type":"SslData","id":"conn-1","data":[104,105]}"#;
+        match TunnelProtocol::deserialize_message(legacy).unwrap() {
+            TunnelMessage::SslData { id, data } => {
+                assert_eq!(id, "conn-1");
+                assert_eq!(data, b"hi".to_vec());
+            }
+            _ => panic!("Expected SslData message"),
+        }
+
+        let missing_body = br#"{"type":"HttpResponse","id":"req-2","status":204,"headers":{}}"#;
+        match TunnelProtocol::deserialize_message(missing_body).unwrap() {
+            TunnelMessage::HttpResponse { body, .. } => assert_eq!(body, None),
+            _ => panic!("Expected HttpResponse message"),
+        }
+    }
+
+    #[test]
+    fn test_payload_encoding_follows_peer_version() {
+        let message = TunnelProtocol::create_ssl_data_message("conn-1", b"hi".to_vec());
+
+        let legacy = TunnelProtocol::serialize_message_text(
+            &message,
+            PayloadEncoding::for_version(LEGACY_PROTOCOL_VERSION),
+        ).unwrap();
+        let json: serde_json::Value = serde_json::from_str(&legacy).unwrap();
+        assert_eq!(json["data"], serde_json::json!([104, 105]));
+
+        let current = TunnelProtocol::serialize_message_text(
+            &message,
+            PayloadEncoding::for_version(PROTOCOL_VERSION),
+        ).unwrap();
+        let json: serde_json::Value = serde_json::from_str(&current).unwrap();
+        assert_eq!(json["data"], "aGk=");
+
+        let protocol = TunnelProtocol::new();
+        assert!(protocol.is_compatible_version(PROTOCOL_VERSION));
+        assert!(protocol.is_compatible_version(LEGACY_PROTOCOL_VERSION));
+    }
 }
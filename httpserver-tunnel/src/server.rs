@@ -1,11 +1,12 @@
 // Phase 7.2 Tunnel Server - Public HTTP Server Integration
 // Tunnel server that accepts WebSocket connections from tunnel clients and routes public traffic
 
-use crate::{ TunnelError, config::TunnelServerConfig, protocol::{ TunnelMessage, TunnelProtocol } };
+use crate::{ TunnelError, config::TunnelServerConfig, protocol::{ PayloadEncoding, TunnelMessage, TunnelProtocol } };
 use crate::subdomain::SubdomainManager;
 use std::collections::HashMap;
 use std::net::SocketAddr;
 use std::sync::Arc;
+use std::sync::atomic::{ AtomicBool, Ordering };
 use std::time::Duration;
 use std::cmp::min;
 use base64::{ Engine as _, engine::general_purpose };
@@ -14,7 +15,7 @@ use futures_util::{ SinkExt, StreamExt };
 use uuid::Uuid;
 use axum::{
     extract::{ State, WebSocketUpgrade, ConnectInfo },
-    http::{ HeaderMap, Method, StatusCode, Uri },
+    http::{ header, HeaderMap, HeaderName, HeaderValue, Method, StatusCode, Uri },
     response::{ IntoResponse, Response },
     routing::{ any, get },
     Router,
@@ -86,6 +87,48 @@ pub struct RateLimiter {
     pub bandwidth_usage: HashMap<String, (u64, std::time::Instant)>,
 }
 
+/// JWT claims read by the tunnel server; unknown claims are ignored while decoding
+/// Claims of an unexpected type read as absent rather than rejecting the token, so a
+/// fractional `exp` means no expiry and a non-string `sub` falls back to `username`
+#[derive(Debug, serde::Deserialize)]
+struct JwtClaims {
+    #[serde(default, deserialize_with = "lenient_i64")]
+    exp: Option<i64>,
+    #[serde(default, deserialize_with = "lenient_string")]
+    sub: Option<String>,
+    #[serde(default, deserialize_with = "lenient_string")]
+    username: Option<String>,
+}
+
+/// Deserialize an integer claim, treating any other JSON type as absent
+fn lenient_i64<'de, D>(deserializer: D) -> Result<Option<i64>, D::Error>
+    where D: serde::Deserializer<'de>
+{
+    let value = <serde_json::Value as serde::Deserialize>::deserialize(deserializer)?;
+    Ok(value.as_i64())
+}
+
+/// Deserialize a string claim, treating any other JSON type as absent
+fn lenient_string<'de, D>(deserializer: D) -> Result<Option<String>, D::Error>
+    where D: serde::Deserializer<'de>
+{
+    match <serde_json::Value as serde::Deserialize>::deserialize(deserializer)? {
+        serde_json::Value::String(value) => Ok(Some(value)),
+        _ => Ok(None),
+    }
+}
+
+/// Outcome of authenticating a tunnel token
+#[derive(Debug, Clone, PartialEq)]
+enum TokenAuthentication {
+    /// Token accepted, with the user it identifies if known
+    Valid {
+        user_info: Option<String>,
+    },
+    /// Token rejected
+    Invalid,
+}
+
 /// Main tunnel server
 pub struct TunnelServer {
     config: TunnelServerConfig,
@@ -405,15 +448,29 @@ impl TunnelServer {
         // Store request sender for authentication phase
         let request_sender_for_auth = request_sender.clone();
 
+        // Set during authentication when the client speaks protocol 1.0 and expects number-array payloads
+        let legacy_payloads = Arc::new(AtomicBool::new(false));
+        let legacy_payloads_for_auth = legacy_payloads.clone();
+
         // Handle incoming messages from tunnel client
         let state_clone = state.clone();
         let tunnel_id_clone = tunnel_id.clone();
         let sender_handle = Arc::new(tokio::sync::Mutex::new(sender));
 
-        // Handle incoming WebSocket messages
+        // Handle incoming WebSocket messages; shutdown is only observed between messages so a
+        // message being handled (such as an auth allocating a subdomain) always completes
+        let (shutdown_tx, mut shutdown_rx) = oneshot::channel::<()>();
         let sender_for_incoming = sender_handle.clone();
-        let incoming_task = tokio::spawn(async move {
-            while let Some(msg) = receiver.next().await {
+        let mut incoming_task = tokio::spawn(async move {
+            loop {
+                let msg = tokio::select! {
+                    msg = receiver.next() => msg,
+                    _ = &mut shutdown_rx => break,
+                };
+                let msg = match msg {
+                    Some(msg) => msg,
+                    None => break,
+                };
                 match msg {
                     Ok(axum::extract::ws::Message::Text(text)) => {
                         if
@@ -426,7 +483,8 @@ impl TunnelServer {
                                 &tunnel_id_clone,
                                 &state_clone,
                                 &sender_for_incoming,
-                                &request_sender_for_auth
+                                &request_sender_for_auth,
+                                &legacy_payloads_for_auth
                             ).await;
                         }
                     }
@@ -437,7 +495,8 @@ impl TunnelServer {
                                 &tunnel_id_clone,
                                 &state_clone,
                                 &sender_for_incoming,
-                                &request_sender_for_auth
+                                &request_sender_for_auth,
+                                &legacy_payloads_for_auth
                             ).await;
                         }
                     }
@@ -452,14 +511,16 @@ impl TunnelServer {
                     _ => {}
                 }
             }
-
-            // Clean up tunnel on disconnect
-            Self::cleanup_tunnel(&tunnel_id_clone, &state_clone).await;
         }); // Handle outgoing requests to tunnel client
         let sender_for_outgoing = sender_handle.clone();
-        let outgoing_task = tokio::spawn(async move {
+        let mut outgoing_task = tokio::spawn(async move {
             while let Some(request_msg) = request_receiver.recv().await {
-                match serde_json::to_string(&request_msg) {
+                let encoding = if legacy_payloads.load(Ordering::Acquire) {
+                    PayloadEncoding::NumberArray
+                } else {
+                    PayloadEncoding::Base64
+                };
+                match TunnelProtocol::serialize_message_text(&request_msg, encoding) {
                     Ok(text) => {
                         let mut sender_guard = sender_for_outgoing.lock().await;
                         if
@@ -480,10 +541,23 @@ impl TunnelServer {
         });
 
         // Wait for either task to complete
-        tokio::select! {
-            _ = incoming_task => {},
-            _ = outgoing_task => {},
+        let outgoing_finished = tokio::select! {
+            _ = &mut incoming_task => false,
+            _ = &mut outgoing_task => true,
+        };
+
+        // Stop whichever side is still running so neither task outlives the connection; the
+        // incoming task is asked to stop rather than aborted so an in-progress auth registers
+        // its subdomain in active_tunnels before cleanup runs
+        if outgoing_finished {
+            let _ = shutdown_tx.send(());
+            let _ = incoming_task.await;
+        } else {
+            outgoing_task.abort();
         }
+
+        // Clean up tunnel on disconnect
+        Self::cleanup_tunnel(&tunnel_id, &state).await;
     }
     /// Handle individual tunnel protocol messages
     async fn handle_tunnel_message(
@@ -498,7 +572,8 @@ impl TunnelServer {
                 >
             >
         >,
-        request_sender: &mpsc::Sender<TunnelMessage>
+        request_sender: &mpsc::Sender<TunnelMessage>,
+        legacy_payloads: &AtomicBool
     ) {
         match message {
             TunnelMessage::Auth { token, subdomain, protocol_version } => {
@@ -509,7 +584,8 @@ impl TunnelServer {
                     protocol_version,
                     state,
                     sender,
-                    request_sender.clone()
+                    request_sender.clone(),
+                    legacy_payloads
                 ).await;
             }
             TunnelMessage::HttpResponse { id, status, headers, body } => {
@@ -608,9 +684,12 @@ impl TunnelServer {
 
                 // Add explicit HTTP-only headers to prevent HTTPS redirects
                 response_builder = response_builder
-                    .header("X-Frame-Options", "SAMEORIGIN")
-                    .header("X-Content-Type-Options", "nosniff")
-                    .header("Referrer-Policy", "strict-origin-when-cross-origin");
+                    .header(header::X_FRAME_OPTIONS, HeaderValue::from_static("SAMEORIGIN"))
+                    .header(header::X_CONTENT_TYPE_OPTIONS, HeaderValue::from_static("nosniff"))
+                    .header(
+                        header::REFERRER_POLICY,
+                        HeaderValue::from_static("strict-origin-when-cross-origin")
+                    );
 
                 // Add body
                 let response_body = body.unwrap_or_default();
@@ -658,6 +737,8 @@ impl TunnelServer {
         }
     }
     /// Handle tunnel authentication
+    /// A client may re-authenticate over the same WebSocket; the new session only replaces the
+    /// old one on success, so a rejected token or failed subdomain allocation leaves it untouched
     async fn handle_auth_message(
         tunnel_id: &str,
         token: String,
@@ -672,7 +753,8 @@ impl TunnelServer {
                 >
             >
         >,
-        request_sender: mpsc::Sender<TunnelMessage>
+        request_sender: mpsc::Sender<TunnelMessage>,
+        legacy_payloads: &AtomicBool
     ) {
         // Validate protocol version
         if !state.protocol.is_compatible_version(&protocol_version) {
@@ -682,39 +764,67 @@ impl TunnelServer {
             };
             Self::send_tunnel_message(&error_msg, sender).await;
             return;
-        } // Validate authentication token
-        if !Self::validate_auth_token(&token, &state.config) {
-            let error_msg = TunnelMessage::Error {
-                code: 401,
-                message: "Invalid authentication token".to_string(),
-            };
-            Self::send_tunnel_message(&error_msg, sender).await;
-            return;
-        } // Extract user information from token for logging purposes only
-        let user_info = Self::extract_user_info(&token, &state.config);
-
-        // Use the requested subdomain as-is, don't derive from user info
-        let preferred_subdomain = requested_subdomain;
+        }
 
-        info!("Authenticating tunnel {} for user: {:?}", tunnel_id, user_info); // Allocate subdomain using SubdomainManager
-        let subdomain = match
-            state.subdomain_manager.allocate_subdomain(
-                tunnel_id,
-                preferred_subdomain,
-                Some("0.0.0.0".to_string()) // TODO: Extract real client IP
-            ).await
-        {
-            Ok(subdomain) => subdomain,
-            Err(e) => {
-                let error_msg = TunnelMessage::AuthResponse {
-                    success: false,
-                    assigned_subdomain: None,
-                    error: Some(format!("Subdomain allocation failed: {}", e)),
+        // Validate authentication token and extract user information for logging purposes only
+        let user_info = match Self::authenticate_token(&token, state) {
+            TokenAuthentication::Valid { user_info } => user_info,
+            TokenAuthentication::Invalid => {
+                let error_msg = TunnelMessage::Error {
+                    code: 401,
+                    message: "Invalid authentication token".to_string(),
                 };
                 Self::send_tunnel_message(&error_msg, sender).await;
                 return;
             }
-        }; // Create tunnel entry
+        };
+
+        // Use the requested subdomain as-is, don't derive from user info
+        let preferred_subdomain = requested_subdomain;
+
+        // Subdomain held by a previous session on this WebSocket, if this is a re-authentication
+        let previous_subdomain = state.active_tunnels
+            .read().await
+            .get(tunnel_id)
+            .map(|tunnel| tunnel.subdomain.clone());
+
+        info!("Authenticating tunnel {} for user: {:?}", tunnel_id, user_info);
+
+        // Re-authenticating without a subdomain (e.g. a token refresh) or for the subdomain already
+        // held keeps it; otherwise allocate a new one while the previous session stays live
+        let kept_subdomain = previous_subdomain
+            .clone()
+            .filter(|previous| {
+                preferred_subdomain.as_deref().map_or(true, |preferred| preferred == previous)
+            });
+        let subdomain = match kept_subdomain {
+            Some(subdomain) => subdomain,
+            None => match
+                state.subdomain_manager.allocate_subdomain(
+                    tunnel_id,
+                    preferred_subdomain,
+                    Some("0.0.0.0".to_string()) // TODO: Extract real client IP
+                ).await
+            {
+                Ok(subdomain) => subdomain,
+                Err(e) => {
+                    let error_msg = TunnelMessage::AuthResponse {
+                        success: false,
+                        assigned_subdomain: None,
+                        error: Some(format!("Subdomain allocation failed: {}", e)),
+                    };
+                    Self::send_tunnel_message(&error_msg, sender).await;
+                    return;
+                }
+            }
+        };
+
+        // Requests are only routed to this session once it is registered below, so the
+        // payload encoding is settled before any payload is sent to the client
+        let encoding = PayloadEncoding::for_version(&protocol_version);
+        legacy_payloads.store(encoding == PayloadEncoding::NumberArray, Ordering::Release);
+
+        // Create tunnel entry
         let tunnel = ActiveTunnel {
             id: tunnel_id.to_string(),
             subdomain: subdomain.clone(),
@@ -729,6 +839,15 @@ impl TunnelServer {
             tunnels.insert(tunnel_id.to_string(), tunnel);
         }
 
+        // Release the previous session's subdomain only once the new one is registered,
+        // so public traffic never sees a gap during re-authentication
+        if let Some(previous_subdomain) = previous_subdomain.filter(|previous| *previous != subdomain) {
+            debug!("Tunnel {} re-authenticated, releasing subdomain {}", tunnel_id, previous_subdomain);
+            if let Err(e) = state.subdomain_manager.release_subdomain(&previous_subdomain).await {
+                warn!("Failed to release subdomain {}: {}", previous_subdomain, e);
+            }
+        }
+
         // Send authentication response
         let auth_response = TunnelMessage::AuthResponse {
             success: true,
@@ -823,67 +942,97 @@ impl TunnelServer {
             .map(|(name, value)| { (name.to_string(), value.to_str().unwrap_or("").to_string()) })
             .collect()
     }
+    /// Authenticate a token, returning the extracted user info if it is valid
+    fn authenticate_token(token: &str, state: &TunnelServerState) -> TokenAuthentication {
+        // Decode JWT claims once; both validation and user extraction read them
+        let claims = Self::decode_jwt_claims(token, &state.config);
+        if !Self::validate_auth_token(token, claims.as_ref(), &state.config) {
+            return TokenAuthentication::Invalid;
+        }
+
+        let user_info = Self::extract_user_info(token, claims.as_ref(), &state.config);
+        TokenAuthentication::Valid { user_info }
+    }
+
+    /// Current time as whole seconds since the Unix epoch, the unit of JWT `exp` claims
+    fn unix_timestamp() -> i64 {
+        std::time::SystemTime
+            ::now()
+            .duration_since(std::time::UNIX_EPOCH)
+            .unwrap_or_default()
+            .as_secs() as i64
+    }
+
     /// Validate authentication token (API key or JWT)
-    fn validate_auth_token(token: &str, config: &TunnelServerConfig) -> bool {
+    fn validate_auth_token(
+        token: &str,
+        claims: Option<&JwtClaims>,
+        config: &TunnelServerConfig
+    ) -> bool {
         if !config.auth.required {
             return true;
         }
 
         // First check if it's a valid API key
-        if config.auth.api_keys.contains(&token.to_string()) {
+        if Self::is_api_key(token, config) {
             return true;
         }
 
         // If JWT is enabled, try to validate as JWT token
-        if config.auth.jwt_enabled {
-            if let Some(jwt_secret) = &config.auth.jwt_secret {
-                if Self::validate_jwt_token(token, jwt_secret) {
-                    return true;
-                }
+        if config.auth.jwt_secret.is_some() {
+            if let Some(claims) = claims {
+                return Self::validate_jwt_claims(claims);
             }
         }
 
         false
     }
-    /// Simple JWT token validation
-    fn validate_jwt_token(token: &str, _secret: &str) -> bool {
+
+    /// Check whether the token is one of the configured API keys
+    fn is_api_key(token: &str, config: &TunnelServerConfig) -> bool {
+        config.auth.api_keys.iter().any(|key| key == token)
+    }
+
+    /// Decode JWT claims (header.payload.signature) once so validation and user extraction share them
+    fn decode_jwt_claims(token: &str, config: &TunnelServerConfig) -> Option<JwtClaims> {
         // For simplicity, just check if token starts with expected format and decode basic claims
-        if !token.starts_with("eyJ") {
-            return false;
+        if !config.auth.jwt_enabled || !token.starts_with("eyJ") {
+            return None;
         }
 
-        // Split JWT token (header.payload.signature)
-        let parts: Vec<&str> = token.split('.').collect();
-        if parts.len() != 3 {
-            return false;
-        } // Try to decode payload (basic validation)
-        if let Ok(payload_bytes) = general_purpose::URL_SAFE_NO_PAD.decode(parts[1]) {
-            if let Ok(payload_str) = std::str::from_utf8(&payload_bytes) {
-                if let Ok(claims) = serde_json::from_str::<serde_json::Value>(payload_str) {
-                    // Check basic JWT structure and expiration if present
-                    if claims.is_object() {
-                        if let Some(exp) = claims.get("exp").and_then(|e| e.as_i64()) {
-                            let now = std::time::SystemTime
-                                ::now()
-                                .duration_since(std::time::UNIX_EPOCH)
-                                .unwrap_or_default()
-                                .as_secs() as i64;
-
-                            return now < exp;
-                        }
-                        return true; // No expiration, consider valid
-                    }
-                }
+        let mut parts = token.split('.');
+        let payload = match (parts.next(), parts.next(), parts.next(), parts.next()) {
+            (Some(_header), Some(payload), Some(_signature), None) => payload,
+            _ => {
+                return None;
             }
+        };
+
+        let payload_bytes = general_purpose::URL_SAFE_NO_PAD.decode(payload).ok()?;
+
+        // Claims must be a JSON object; serde would otherwise also accept a positional array
+        if payload_bytes.iter().find(|byte| !byte.is_ascii_whitespace()) != Some(&b'{') {
+            return None;
         }
+        serde_json::from_slice::<JwtClaims>(&payload_bytes).ok()
+    }
 
-        false
+    /// Simple JWT claims validation (expiration only)
+    fn validate_jwt_claims(claims: &JwtClaims) -> bool {
+        match claims.exp {
+            Some(exp) => Self::unix_timestamp() < exp,
+            None => true, // No expiration, consider valid
+        }
     }
 
     /// Extract user info from token (API key or JWT)
-    fn extract_user_info(token: &str, config: &TunnelServerConfig) -> Option<String> {
+    fn extract_user_info(
+        token: &str,
+        claims: Option<&JwtClaims>,
+        config: &TunnelServerConfig
+    ) -> Option<String> {
         // For API keys, we can create a simple mapping
-        if config.auth.api_keys.contains(&token.to_string()) {
+        if Self::is_api_key(token, config) {
             // Simple user extraction - use first part of API key or static mapping
             if token.starts_with("sk-") {
                 return Some(format!("user-{}", &token[3..min(token.len(), 13)]));
@@ -893,25 +1042,8 @@ impl TunnelServer {
         }
 
         // For JWT tokens, extract from claims
-        if config.auth.jwt_enabled && token.starts_with("eyJ") {
-            let parts: Vec<&str> = token.split('.').collect();
-            if parts.len() == 3 {
-                if let Ok(payload_bytes) = general_purpose::URL_SAFE_NO_PAD.decode(parts[1]) {
-                    if let Ok(payload_str) = std::str::from_utf8(&payload_bytes) {
-                        if let Ok(claims) = serde_json::from_str::<serde_json::Value>(payload_str) {
-                            if let Some(sub) = claims.get("sub").and_then(|s| s.as_str()) {
-                                return Some(sub.to_string());
-                            }
-                            if let Some(username) = claims.get("username").and_then(|u| u.as_str()) {
-                                return Some(username.to_string());
-                            }
-                        }
-                    }
-                }
-            }
-        }
-
-        None
+        let claims = claims?;
+        claims.sub.clone().or_else(|| claims.username.clone())
     }
     /// Check rate limiting for a tunnel
     async fn check_rate_limit(
@@ -922,53 +1054,33 @@ impl TunnelServer {
         let now = std::time::Instant::now();
 
         let mut rate_limiter = state.rate_limiter.lock().unwrap();
+        let rate_limiter = &mut *rate_limiter;
 
-        // Check request rate limit
-        let should_reset_window;
-        let current_count;
-        let current_connections;
-
-        {
-            let (count, window_start) = rate_limiter.request_counts
-                .entry(tunnel_id.to_string())
-                .or_insert((0, now));
-
-            // Check if window should be reset
-            should_reset_window = now.duration_since(*window_start) > Duration::from_secs(60);
-            current_count = *count;
-        }
-
-        // Reset window if needed
-        if should_reset_window {
-            if let Some((count, window_start)) = rate_limiter.request_counts.get_mut(tunnel_id) {
-                *count = 0;
-                *window_start = now;
-            }
-        }
+        // Look up this tunnel's request window once and work on it in place
+        let (count, window_start) = rate_limiter.request_counts
+            .entry(tunnel_id.to_string())
+            .or_insert((0, now));
 
-        // Check rate limit
-        if current_count >= config.requests_per_minute && !should_reset_window {
+        // Reset the window if it has expired, otherwise check the request rate limit
+        if now.duration_since(*window_start) > Duration::from_secs(60) {
+            *count = 0;
+            *window_start = now;
+        } else if *count >= config.requests_per_minute {
             return Err("Request rate limit exceeded".to_string());
         }
 
         // Check concurrent connections
-        current_connections = rate_limiter.active_connections.get(tunnel_id).copied().unwrap_or(0);
+        let connections = rate_limiter.active_connections
+            .entry(tunnel_id.to_string())
+            .or_insert(0);
 
-        if current_connections >= config.max_concurrent_connections {
+        if *connections >= config.max_concurrent_connections {
             return Err("Concurrent connection limit exceeded".to_string());
         }
 
         // Increment counters
-        if let Some((count, _)) = rate_limiter.request_counts.get_mut(tunnel_id) {
-            *count += 1;
-        }
-
-        rate_limiter.active_connections
-            .entry(tunnel_id.to_string())
-            .and_modify(|c| {
-                *c += 1;
-            })
-            .or_insert(1);
+        *count += 1;
+        *connections += 1;
 
         Ok(())
     }
@@ -1227,7 +1339,7 @@ impl TunnelServer {
         // Task 1: Forward data from client to tunnel
         let tunnel_sender = tunnel.request_sender.clone();
         let connection_id_read = connection_id.clone();
-        let client_to_tunnel_task = tokio::spawn(async move {
+        let mut client_to_tunnel_task = tokio::spawn(async move {
             let mut buffer = [0u8; 8192];
             loop {
                 match read_half.read(&mut buffer).await {
@@ -1254,30 +1366,39 @@ impl TunnelServer {
                     }
                 }
             }
-
-            // Send SSL close message
-            let ssl_close_msg = TunnelMessage::SslClose {
-                id: connection_id_read,
-            };
-            let _ = tunnel_sender.send(ssl_close_msg).await;
         });
 
         // Task 2: Forward data from tunnel to client
         let connection_id_write = connection_id.clone();
-        let tunnel_to_client_task = tokio::spawn(async move {
+        // Returns true when the tunnel client closed the connection, false if the public client went away
+        let mut tunnel_to_client_task = tokio::spawn(async move {
             while let Some(data) = ssl_rx.recv().await {
                 if let Err(e) = write_half.write_all(&data).await {
                     error!("Failed to write SSL data to client: {}", e);
-                    break;
+                    return false;
                 }
             }
             debug!("SSL tunnel to client forwarding stopped for {}", connection_id_write);
+            true
         });
 
         // Wait for either task to complete (connection closed)
-        tokio::select! {
-            _ = client_to_tunnel_task => {},
-            _ = tunnel_to_client_task => {},
+        let tunnel_closed = tokio::select! {
+            _ = &mut client_to_tunnel_task => false,
+            result = &mut tunnel_to_client_task => result.unwrap_or(false),
+        };
+
+        // Stop the other direction so it doesn't hold the socket half or channel open
+        client_to_tunnel_task.abort();
+        tunnel_to_client_task.abort();
+
+        // Notify the tunnel client unless it closed the connection itself, in which case
+        // echoing SslClose back would be redundant
+        if !tunnel_closed {
+            let ssl_close_msg = TunnelMessage::SslClose {
+                id: connection_id.clone(),
+            };
+            let _ = tunnel.request_sender.send(ssl_close_msg).await;
         }
 
         // Cleanup SSL connection state
@@ -1299,14 +1420,85 @@ impl TunnelServer {
 
         // Add headers to prevent HTTPS redirects and ensure HTTP-only operation
         let headers = response.headers_mut();
-        headers.insert("X-Frame-Options", "SAMEORIGIN".parse().unwrap());
-        headers.insert("X-Content-Type-Options", "nosniff".parse().unwrap());
-        headers.insert("Referrer-Policy", "strict-origin-when-cross-origin".parse().unwrap());
-        headers.insert("X-Forwarded-Proto", "http".parse().unwrap());
+        headers.insert(header::X_FRAME_OPTIONS, HeaderValue::from_static("SAMEORIGIN"));
+        headers.insert(header::X_CONTENT_TYPE_OPTIONS, HeaderValue::from_static("nosniff"));
+        headers.insert(
+            header::REFERRER_POLICY,
+            HeaderValue::from_static("strict-origin-when-cross-origin")
+        );
+        headers.insert(
+            HeaderName::from_static("x-forwarded-proto"),
+            HeaderValue::from_static("http")
+        );
 
         // Explicitly remove any HSTS headers that might be added elsewhere
-        headers.remove("Strict-Transport-Security");
+        headers.remove(header::STRICT_TRANSPORT_SECURITY);
 
         response
     }
 }
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    fn jwt_config() -> TunnelServerConfig {
+        let mut config = TunnelServerConfig::default();
+        config.auth.required = true;
+        config.auth.jwt_enabled = true;
+        config.auth.jwt_secret = Some("test-secret".to_string());
+        config
+    }
+
+    fn jwt_with_payload(payload: &str) -> String {
+        format!("eyJhbGciOiJIUzI1NiJ9.{}.signature", general_purpose::URL_SAFE_NO_PAD.encode(payload))
+    }
+
+    #[test]
+    fn test_authenticate_token() {
+        let server = TunnelServer::new(jwt_config()).expect("Failed to create tunnel server");
+        let exp = TunnelServer::unix_timestamp() + 3600;
+        let valid = jwt_with_payload(&format!(r#"{{"sub":"alice","exp":{}}}"#, exp));
+        let expired = jwt_with_payload(r#"{"sub":"alice","exp":1000}"#);
+
+        assert_eq!(
+            TunnelServer::authenticate_token(&valid, &server.state),
+            TokenAuthentication::Valid { user_info: Some("alice".to_string()) }
+        );
+        assert_eq!(TunnelServer::authenticate_token(&expired, &server.state), TokenAuthentication::Invalid);
+        assert_eq!(TunnelServer::authenticate_token("not-a-token", &server.state), TokenAuthentication::Invalid);
+    }
+
+    #[test]
+    fn test_fractional_exp_means_no_expiry() {
+        let config = jwt_config();
+        let token = jwt_with_payload(r#"{"sub":"alice","exp":1.5}"#);
+
+        let claims = TunnelServer::decode_jwt_claims(&token, &config).expect("Claims should decode");
+        assert_eq!(claims.exp, None);
+        assert!(TunnelServer::validate_auth_token(&token, Some(&claims), &config));
+    }
+
+    #[test]
+    fn test_non_string_sub_falls_back_to_username() {
+        let config = jwt_config();
+        let token = jwt_with_payload(r#"{"sub":42,"username":"bob"}"#);
+
+        let claims = TunnelServer::decode_jwt_claims(&token, &config).expect("Claims should decode");
+        assert_eq!(
+            TunnelServer::extract_user_info(&token, Some(&claims), &config),
+            Some("bob".to_string())
+        );
+    }
+
+    #[test]
+    fn test_non_object_claims_are_rejected() {
+        let config = jwt_config();
+
+        for payload in [r#"[1700000000,"alice","alice"]"#, "42", r#""alice""#] {
+            let token = jwt_with_payload(payload);
+            assert!(TunnelServer::decode_jwt_claims(&token, &config).is_none());
+            assert!(!TunnelServer::validate_auth_token(&token, None, &config));
+        }
+    }
+}